@@ -0,0 +1,111 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Molecule bucket width, entries kept in memory, seconds an answer stays valid and optional SQLite file
+ADVICE_CACHE_STEP = float(os.environ.get("ADVICE_CACHE_STEP", "10"))
+ADVICE_CACHE_SIZE = int(os.environ.get("ADVICE_CACHE_SIZE", "1024"))
+ADVICE_CACHE_TTL = float(os.environ.get("ADVICE_CACHE_TTL", "86400"))
+ADVICE_CACHE_DB = os.environ.get("ADVICE_CACHE_DB")
+# Seconds between purges of expired rows from the SQLite file
+ADVICE_CACHE_SWEEP_SECONDS = float(os.environ.get("ADVICE_CACHE_SWEEP_SECONDS", "3600"))
+
+# Cache for LLM advice keyed by a bucketed molecule profile, so nearly identical
+# pollutant readings reuse one answer. Entries live in an in-memory LRU with a TTL,
+# optionally backed by a SQLite file that survives restarts and is shared by workers.
+# With a SQLite file, get() and put() do disk I/O; call them off the event loop.
+class AdviceCache:
+    def __init__(self, max_size=None, ttl=None, step=None, db_path=None, sweep_interval=None):
+        self.max_size = max_size or ADVICE_CACHE_SIZE
+        self.ttl = ttl or ADVICE_CACHE_TTL
+        self.step = step or ADVICE_CACHE_STEP
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()  # the connection is shared by threads; memory lookups never wait on it
+        self.sweep_interval = ADVICE_CACHE_SWEEP_SECONDS if sweep_interval is None else sweep_interval
+        self._swept_at = time.monotonic()
+        db_path = db_path or ADVICE_CACHE_DB
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS advice (key TEXT PRIMARY KEY, value TEXT, expires_at REAL)"
+            )
+            self._db.commit()
+
+    # Quantize the molecule values into buckets of width step, prefixed with the prompt version
+    def key(self, molecules, template_version):
+        buckets = ",".join(str(int(round(value / self.step))) for value in molecules)
+        return f"v{template_version}:{buckets}"
+
+    @property
+    def persistent(self):
+        return self._db is not None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+
+        if self._db is not None:
+            with self._db_lock:
+                row = self._db.execute(
+                    "SELECT value, expires_at FROM advice WHERE key = ?", (key,)
+                ).fetchone()
+            if row is not None and row[1] > now:
+                with self._lock:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, value):
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._remember(key, value, expires_at)
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO advice (key, value, expires_at) VALUES (?, ?, ?)",
+                    (key, value, expires_at)
+                )
+                self._db.commit()
+            if time.monotonic() - self._swept_at >= self.sweep_interval:
+                self.sweep()
+
+    # Drop expired rows from the SQLite file; put() calls this at most once per sweep_interval
+    def sweep(self):
+        self._swept_at = time.monotonic()
+        if self._db is None:
+            return
+        with self._db_lock:
+            self._db.execute("DELETE FROM advice WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+    def _remember(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "size": len(self._entries),
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
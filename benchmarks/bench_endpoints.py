@@ -0,0 +1,193 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+from benchmarks import stubs
+
+# Load-test the FastAPI endpoints in-process against the stand-ins in stubs.py.
+#
+#   python benchmarks/bench_endpoints.py --concurrency 1 8 32 --range-days 1 30 365
+#
+# Prints one JSON document with p50/p95/p99 latency, requests/sec and error count per
+# endpoint, scenario and concurrency level. Each endpoint/range scenario runs in its own
+# process, so every result carries the peak RSS of that scenario alone.
+
+ENDPOINTS = ("predict", "predict-new", "predict-date-range", "predict-date-range/stream", "predict-bulk", "chatbot")
+RANGED_ENDPOINTS = {"predict-date-range", "predict-date-range/stream", "predict-bulk"}
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+# Peak resident set size of this process in bytes (ru_maxrss is KiB on Linux, bytes on macOS)
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+async def drive(client, method, path, make_body, requests, concurrency):
+    latencies = []
+    errors = 0
+    next_request = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in next_request:
+            started = time.perf_counter()
+            response = await client.request(method, path, json=make_body(i))
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "requests_per_second": requests / elapsed if elapsed else None,
+        "latency_seconds": {
+            "p50": percentile(latencies, 0.50),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+            "max": latencies[-1] if latencies else None,
+        },
+    }
+
+def scenarios(main, range_days, start):
+    registry = main.station_registry
+    station_names = [station["StationName"] for station in registry.stations
+                     if station["StationName"] not in registry.ambiguous_names]
+
+    def hour_body(i):
+        when = start + timedelta(days=i % 7)
+        return {
+            "year": when.year, "month": when.month, "day": when.day, "hour": i % 24,
+            "dayOfWeek": when.weekday(), "isWeekend": int(when.weekday() >= 5),
+        }
+
+    yield "predict", None, "POST", "/predict", lambda i: {"city": "Delhi", **hour_body(i)}
+    yield "predict-new", None, "POST", "/predict-new", \
+        lambda i: {"station_name": station_names[i % len(station_names)], **hour_body(i)}
+    for days in range_days:
+        def range_body(i, days=days):
+            return {
+                "city": main.cities[i % len(main.cities)],
+                "fromDate": str(start),
+                "toDate": str(start + timedelta(days=days - 1)),
+            }
+        yield "predict-date-range", days, "POST", "/predict-date-range", range_body
+        yield "predict-date-range/stream", days, "POST", "/predict-date-range/stream", range_body
+        yield "predict-bulk", days, "POST", "/predict-bulk", lambda i, days=days: {
+            "cities": main.cities,
+            "fromDate": str(start),
+            "toDate": str(start + timedelta(days=days - 1)),
+        }
+    yield "chatbot", None, "POST", "/chatbot", lambda i: {"message": f"What are the limits for source {i}?"}
+
+# Child process: run one scenario at every concurrency level and report its peak RSS
+async def run_scenario(args):
+    import httpx
+    import main
+
+    if args.cube:
+        main.refresh_forecast_cubes()
+
+    start = date.today()
+    transport = httpx.ASGITransport(app=main.app)
+    results = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for name, days, method, path, make_body in scenarios(main, args.range_days, start):
+            if name != args.scenario:
+                continue
+            for concurrency in args.concurrency:
+                result = await drive(client, method, path, make_body, args.requests, concurrency)
+                result.update({"endpoint": name, "range_days": days})
+                results.append(result)
+                print(f"{name} days={days} c={concurrency}: "
+                      f"p50={result['latency_seconds']['p50']:.4f}s rps={result['requests_per_second']:.1f}",
+                      file=sys.stderr)
+
+    rss = peak_rss_bytes()
+    for result in results:
+        result["peak_rss_bytes"] = rss
+    return results
+
+def run(args):
+    results = []
+    with tempfile.TemporaryDirectory(prefix="aqi-bench-") as workdir:
+        for name in args.only or ENDPOINTS:
+            for days in (args.range_days if name in RANGED_ENDPOINTS else [None]):
+                command = [
+                    sys.executable, os.path.abspath(__file__), "--scenario", name, "--workdir", workdir,
+                    "--requests", str(args.requests),
+                    "--concurrency", *map(str, args.concurrency),
+                    "--predict-call-seconds", str(args.predict_call_seconds),
+                    "--predict-row-seconds", str(args.predict_row_seconds),
+                    "--llm-seconds", str(args.llm_seconds),
+                ]
+                if days is not None:
+                    command += ["--range-days", str(days)]
+                if args.cube:
+                    command.append("--cube")
+                output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True, cwd=ROOT).stdout
+                results.extend(json.loads(output))
+
+    return {
+        "settings": {
+            "predict_call_seconds": args.predict_call_seconds,
+            "predict_row_seconds": args.predict_row_seconds,
+            "llm_seconds": args.llm_seconds,
+            "requests": args.requests,
+            "forecast_cube": args.cube,
+        },
+        "results": results,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the API endpoints in-process with stub models")
+    parser.add_argument("--requests", type=int, default=200, help="requests per endpoint and concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--range-days", type=int, nargs="+", default=[1, 30, 365])
+    parser.add_argument("--only", nargs="+", choices=ENDPOINTS, help="endpoint names to run, e.g. predict chatbot")
+    parser.add_argument("--cube", action="store_true", help="build the forecast cubes first and serve from them")
+    parser.add_argument("--predict-call-seconds", type=float, default=stubs.SETTINGS["predict_call_seconds"])
+    parser.add_argument("--predict-row-seconds", type=float, default=stubs.SETTINGS["predict_row_seconds"])
+    parser.add_argument("--llm-seconds", type=float, default=stubs.SETTINGS["llm_seconds"])
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--scenario", help=argparse.SUPPRESS)  # set for the per-scenario child process
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.scenario:
+        stubs.install(
+            args.workdir,
+            predict_call_seconds=args.predict_call_seconds,
+            predict_row_seconds=args.predict_row_seconds,
+            llm_seconds=args.llm_seconds,
+        )
+        json.dump(asyncio.run(run_scenario(args)), sys.stdout)
+        return
+
+    report = run(args)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
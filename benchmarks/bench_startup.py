@@ -0,0 +1,77 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Micro-benchmark for process start: time to import main.py (model loading, app setup and
+# building or loading the chatbot index) in a fresh interpreter, using the stand-ins in
+# stubs.py. "cold" starts from an empty index store, "warm" reuses the index saved by the
+# previous run.
+#
+#   python benchmarks/bench_startup.py --runs 5 --embed-chunk-seconds 0.01
+
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+from benchmarks import stubs
+stubs.install({workdir!r}, pages={pages}, embed_chunk_seconds={embed})
+import index_store
+calls = []
+build = index_store.load_or_build_index
+def timed_build(*args, **kwargs):
+    started = time.perf_counter()
+    try:
+        return build(*args, **kwargs)
+    finally:
+        calls.append(time.perf_counter() - started)
+index_store.load_or_build_index = timed_build
+started = time.perf_counter()
+import main
+print(json.dumps({{"import_seconds": time.perf_counter() - started, "index_seconds": sum(calls)}}))
+"""
+
+def measure(workdir, args):
+    code = CHILD.format(root=ROOT, workdir=workdir, pages=args.pages, embed=args.embed_chunk_seconds)
+    output = subprocess.run([sys.executable, "-c", code], check=True, capture_output=True, text=True, cwd=ROOT).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def summarize(samples):
+    summary = {}
+    for key in samples[0]:
+        values = [sample[key] for sample in samples]
+        summary[key] = {"min": min(values), "median": statistics.median(values), "max": max(values)}
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure main.py import and index build time")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=20, help="pages in the stand-in document")
+    parser.add_argument("--embed-chunk-seconds", type=float, default=0.002)
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        with tempfile.TemporaryDirectory(prefix="aqi-startup-") as workdir:
+            cold.append(measure(workdir, args))
+            warm.append(measure(workdir, args))
+
+    report = {
+        "settings": {"runs": args.runs, "pages": args.pages, "embed_chunk_seconds": args.embed_chunk_seconds},
+        "cold": summarize(cold),
+        "warm": summarize(warm),
+    }
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
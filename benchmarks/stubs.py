@@ -0,0 +1,179 @@
+import os
+import pickle
+import sys
+import tempfile
+import time
+import types
+import uuid
+import numpy as np
+
+# Lightweight stand-ins for the models, Ollama, Nomic embeddings, FAISS and the PDF reader so
+# main.py can be imported and benchmarked offline. Latencies are configurable to mimic the
+# real dependencies: a fixed cost per model.predict call plus a cost per row, a fixed cost
+# per LLM call and a cost per embedded chunk.
+SETTINGS = {
+    "predict_call_seconds": 0.0005,
+    "predict_row_seconds": 0.000002,
+    "llm_seconds": 0.05,
+    "embed_chunk_seconds": 0.002,
+}
+
+# Deterministic multi-output regressor with the same interface as the pickled models
+class StubModel:
+    def __init__(self, n_features, seed):
+        rng = np.random.default_rng(seed)
+        self.weights = rng.uniform(0.0, 1.0, size=(n_features, 13))
+
+    def predict(self, X):
+        X = np.asarray(X, dtype="float64")
+        time.sleep(SETTINGS["predict_call_seconds"] + SETTINGS["predict_row_seconds"] * len(X))
+        return np.abs(np.sin(X @ self.weights)) * 200.0
+
+class StubLLM:
+    def __init__(self, model=None, base_url=None, **kwargs):
+        self.model = model
+
+    def invoke(self, prompt):
+        time.sleep(SETTINGS["llm_seconds"])
+        return "1. Steel industry\n2. Thermal power plants\n3. Brick kilns\n4. Cement plants"
+
+class StubEmbeddings:
+    def __init__(self, model=None, **kwargs):
+        self.model = model
+
+    def embed_documents(self, texts):
+        time.sleep(SETTINGS["embed_chunk_seconds"] * len(texts))
+        return [[float(len(text))] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text))]
+
+class StubRetriever:
+    def __init__(self, texts):
+        self.texts = texts
+
+class StubFAISS:
+    def __init__(self, texts):
+        self.texts = texts
+
+    @classmethod
+    def from_texts(cls, texts, embedding):
+        embedding.embed_documents(texts)
+        return cls(list(texts))
+
+    def save_local(self, folder_path):
+        os.makedirs(folder_path, exist_ok=True)
+        with open(os.path.join(folder_path, "index.pkl"), 'wb') as file:
+            pickle.dump(self.texts, file)
+
+    @classmethod
+    def load_local(cls, folder_path, embeddings, allow_dangerous_deserialization=False):
+        with open(os.path.join(folder_path, "index.pkl"), 'rb') as file:
+            return cls(pickle.load(file))
+
+    def as_retriever(self):
+        return StubRetriever(self.texts)
+
+class StubMemory:
+    def __init__(self, **kwargs):
+        pass
+
+class StubCallbackHandler:
+    pass
+
+# Calls the LLM once per question and reports retriever/LLM runs to callbacks like LangChain does
+class StubChain:
+    def __init__(self, llm, retriever):
+        self.llm = llm
+        self.retriever = retriever
+
+    @classmethod
+    def from_llm(cls, llm, retriever, memory):
+        return cls(llm, retriever)
+
+    def __call__(self, question, callbacks=None):
+        callbacks = callbacks or []
+        retriever_run, llm_run = uuid.uuid4(), uuid.uuid4()
+        for callback in callbacks:
+            callback.on_retriever_start({}, question, run_id=retriever_run)
+        documents = self.retriever.texts[:4]
+        for callback in callbacks:
+            callback.on_retriever_end(documents, run_id=retriever_run)
+            callback.on_llm_start({}, [question], run_id=llm_run)
+        answer = self.llm.invoke(question)
+        for callback in callbacks:
+            callback.on_llm_end(answer, run_id=llm_run)
+        return {"question": question, "answer": answer}
+
+class StubSplitter:
+    def __init__(self, separator="\n", chunk_size=1000, chunk_overlap=200, length_function=len):
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+
+    def split_text(self, text):
+        step = self.chunk_size - self.chunk_overlap
+        return [text[start:start + self.chunk_size] for start in range(0, max(len(text), 1), step)]
+
+class StubPage:
+    def __init__(self, text):
+        self.text = text
+
+    def extract_text(self):
+        return self.text
+
+# Reads the stand-in "PDF" as plain text, one page per form feed
+class StubPdfReader:
+    def __init__(self, path):
+        with open(path) as file:
+            self.pages = [StubPage(text) for text in file.read().split("\f")]
+
+def _module(name, **attributes):
+    module = types.ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+    return module
+
+# Register the stand-ins under the import names main.py uses, write stub model pickles and a
+# stand-in document to a scratch directory and point main.py at them through its environment
+# variables. Must run before main is imported; returns the scratch directory.
+def install(workdir=None, pages=20, **settings):
+    SETTINGS.update(settings)
+    workdir = workdir or tempfile.mkdtemp(prefix="aqi-bench-")
+
+    _module("sklearnex", patch_sklearn=lambda: None)
+    _module("nomic", cli=types.SimpleNamespace(login=lambda token: None))
+    _module("serpapi", GoogleSearch=object)
+    _module("PyPDF2", PdfReader=StubPdfReader)
+    _module("langchain")
+    _module("langchain.memory", ConversationBufferMemory=StubMemory)
+    _module("langchain.chains", ConversationalRetrievalChain=StubChain)
+    _module("langchain.callbacks")
+    _module("langchain.callbacks.base", BaseCallbackHandler=StubCallbackHandler)
+    _module("langchain.text_splitter", CharacterTextSplitter=StubSplitter)
+    _module("langchain_community")
+    _module("langchain_community.llms", Ollama=StubLLM)
+    _module("langchain_community.vectorstores", FAISS=StubFAISS)
+    _module("langchain_community.document_loaders", PDFPlumberLoader=object)
+    _module("langchain_nomic", NomicEmbeddings=StubEmbeddings)
+
+    model_path = os.path.join(workdir, "model.pkl")
+    station_path = os.path.join(workdir, "station.pkl")
+    pdf_path = os.path.join(workdir, "document.pdf")
+    if not os.path.exists(model_path):
+        with open(model_path, 'wb') as file:
+            pickle.dump(StubModel(26 + 6, seed=1), file)
+        with open(station_path, 'wb') as file:
+            pickle.dump(StubModel(1 + 6, seed=2), file)
+        with open(pdf_path, 'w') as file:
+            file.write("\f".join(
+                "\n".join(f"Regulation {page}.{line}: emission limits for industrial sources." for line in range(60))
+                for page in range(pages)
+            ))
+
+    os.environ.setdefault("AQI_MODEL_PATH", model_path)
+    os.environ.setdefault("STATION_MODEL_PATH", station_path)
+    os.environ.setdefault("CHATBOT_PDF", pdf_path)
+    os.environ.setdefault("INDEX_STORE_DIR", os.path.join(workdir, "index_store"))
+    os.environ.setdefault("FORECAST_CUBE_DIR", os.path.join(workdir, "forecast_cube"))
+    os.environ.setdefault("FORECAST_CUBE_REFRESH_SECONDS", "0")
+    return workdir
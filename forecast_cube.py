@@ -0,0 +1,212 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import numpy as np
+from inference import N_OUTPUTS, hourly_range, location_features, batch_predict
+from metrics import stage
+
+# Cross-process refresh lock; without fcntl (Windows) refreshes are only serialized within a process
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Where cubes are written, how many days ahead they cover and how often readers re-check for a newer cube
+FORECAST_CUBE_DIR = os.environ.get("FORECAST_CUBE_DIR", "forecast_cube")
+FORECAST_CUBE_DAYS = int(os.environ.get("FORECAST_CUBE_DAYS", "14"))
+FORECAST_CUBE_RELOAD_SECONDS = float(os.environ.get("FORECAST_CUBE_RELOAD_SECONDS", "30"))
+
+# Hash of a model pickle; a cube built from a different pickle is never served
+def model_fingerprint(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+# Precomputed model outputs for every location over a rolling hourly horizon, stored as a
+# memory-mapped float64 array of shape (location, hour, 13). <name>.json points at the
+# current data file; refresh() writes a new data file and swaps the pointer atomically,
+# so processes still mapping the previous file keep reading consistent data. Refreshes
+# from several processes (uvicorn --workers N) take turns on <name>.lock.
+class ForecastCube:
+    def __init__(self, name, fingerprint, directory=None):
+        self.name = name
+        self.fingerprint = fingerprint
+        self.directory = directory or FORECAST_CUBE_DIR
+        self.meta_path = os.path.join(self.directory, f"{name}.json")
+        self.lock_path = os.path.join(self.directory, f"{name}.lock")
+        # (meta, values) swapped as one object, so a reader never pairs a new array with old meta
+        self.state = None
+        self.hits = 0
+        self.misses = 0
+        self._meta_mtime = None
+        self._checked_at = 0.0
+        self._refresh_lock = threading.Lock()
+
+    # (Re)map the current data file if the pointer changed since the last check
+    def load(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._checked_at < FORECAST_CUBE_RELOAD_SECONDS:
+            return
+        self._checked_at = now
+        try:
+            mtime = os.stat(self.meta_path).st_mtime_ns
+        except OSError:
+            self.state, self._meta_mtime = None, None
+            return
+        if mtime == self._meta_mtime:
+            return
+        try:
+            with open(self.meta_path) as file:
+                meta = json.load(file)
+            values = np.load(os.path.join(self.directory, meta["data"]), mmap_mode='r')
+        except (OSError, ValueError):
+            # Caught mid-swap by a concurrent refresh; keep the current mapping and retry later
+            return
+        self.state = (meta, values)
+        self._meta_mtime = mtime
+
+    # Only one refresh at a time, across threads and (with fcntl) across processes
+    @contextmanager
+    def _locked(self):
+        with self._refresh_lock:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self.lock_path, 'a') as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    if fcntl is not None:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # Model outputs for one location at an array of hourly timestamps, or None if any
+    # of them fall outside the cube (or the cube is missing / from another model)
+    def lookup(self, location, times):
+        self.load()
+        state = self.state
+        if state is None or state[0]["fingerprint"] != self.fingerprint or len(times) == 0:
+            self.misses += 1
+            return None
+        meta, values = state
+        offsets = (times - np.datetime64(meta["start"], "h")).astype(np.int64)
+        if location < 0 or location >= values.shape[0] \
+                or offsets.min() < 0 or offsets.max() >= values.shape[1]:
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Contiguous ascending hours are a plain slice; anything else (unsorted, repeated) is gathered in order
+        if np.all(np.diff(offsets) == 1):
+            return values[location, offsets[0]:offsets[-1] + 1]
+        return values[location, offsets]
+
+    def lookup_hour(self, location, when):
+        row = self.lookup(location, np.array([np.datetime64(when, "h")]))
+        return None if row is None else row[0]
+
+    # Bring the cube up to date for a horizon starting at `start`. Hours already computed
+    # with the same model are carried over; only hours new to the horizon are predicted.
+    # A process that waited on the lock for another one's refresh finds the cube current.
+    def refresh(self, model, encodings, start=None, days=None):
+        start = start or datetime.combine(datetime.now().date(), datetime.min.time())
+        days = days or FORECAST_CUBE_DAYS
+        times = hourly_range(start, start + timedelta(days=days - 1))
+        encodings = np.asarray(encodings, dtype="float32").reshape(len(encodings), -1)
+        with self._locked():
+            return self._refresh(model, encodings, times)
+
+    def _refresh(self, model, encodings, times):
+        self.load(force=True)
+        state = self.state
+
+        reuse = 0
+        if state is not None and state[0]["fingerprint"] == self.fingerprint \
+                and state[1].shape[0] == len(encodings):
+            meta, current = state
+            shift = int((times[0] - np.datetime64(meta["start"], "h")).astype(np.int64))
+            if shift == 0 and current.shape[1] == len(times):
+                return 0
+            if 0 <= shift < current.shape[1]:
+                reuse = min(current.shape[1] - shift, len(times))
+
+        data_name = f"{self.name}-{uuid.uuid4().hex}.npy"
+        values = np.lib.format.open_memmap(
+            os.path.join(self.directory, data_name), mode='w+', dtype="float64",
+            shape=(len(encodings), len(times), N_OUTPUTS)
+        )
+        if reuse:
+            values[:, :reuse] = current[:, shift:shift + reuse]
+        new_times = times[reuse:]
+        if len(new_times):
+            prediction = batch_predict(model, location_features(encodings, new_times))
+            values[:, reuse:] = prediction[:, :N_OUTPUTS].reshape(len(encodings), len(new_times), N_OUTPUTS)
+        values.flush()
+        del values
+
+        tmp_meta = f"{self.meta_path}.tmp-{os.getpid()}"
+        with open(tmp_meta, 'w') as file:
+            json.dump({
+                "data": data_name,
+                "fingerprint": self.fingerprint,
+                "start": str(times[0]),
+                "hours": len(times),
+                "locations": len(encodings)
+            }, file)
+        os.replace(tmp_meta, self.meta_path)
+
+        # The file the old pointer named can go; readers that still map it keep it alive until they reload
+        if state is not None:
+            try:
+                os.remove(os.path.join(self.directory, state[0]["data"]))
+            except OSError:
+                pass
+        self.load(force=True)
+        return len(new_times) * len(encodings)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+# Model outputs for several locations over the same timestamps as a (location, time, 13) array.
+# Locations found in the cube are copied out of it; the rest share one batched model run.
+def cached_predict(model, cube, locations, encodings, times):
+    grid = np.empty((len(locations), len(times), N_OUTPUTS), dtype="float64")
+    misses = []
+    with stage("cube_lookup"):
+        for i, location in enumerate(locations):
+            cached = cube.lookup(location, times) if location is not None else None
+            if cached is None:
+                misses.append(i)
+            else:
+                grid[i] = cached
+    if misses and len(times):
+        prediction = batch_predict(model, location_features([encodings[i] for i in misses], times))
+        grid[misses] = prediction[:, :N_OUTPUTS].reshape(len(misses), len(times), N_OUTPUTS)
+    return grid
+
+# Keep refreshing the cubes in a daemon thread so the horizon rolls forward on its own
+def start_refresher(refresh, interval):
+    def run():
+        while True:
+            try:
+                with stage("cube_refresh"):
+                    refresh()
+            except Exception:
+                logger.exception("Forecast cube refresh failed")
+            time.sleep(interval)
+    thread = threading.Thread(target=run, name="forecast-cube-refresh", daemon=True)
+    thread.start()
+    return thread
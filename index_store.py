@@ -0,0 +1,50 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from langchain_community.vectorstores import FAISS
+
+# Where saved FAISS indexes live, one sub-directory per content key
+INDEX_STORE_DIR = os.environ.get("INDEX_STORE_DIR", "index_store")
+
+# Content key for an index: hash of the source PDF bytes plus everything that changes the chunks/vectors
+def index_key(pdf_path, chunk_params, embedding_model):
+    digest = hashlib.sha256()
+    with open(pdf_path, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b""):
+            digest.update(block)
+    digest.update(json.dumps({"chunking": chunk_params, "embedding": embedding_model}, sort_keys=True).encode())
+    return digest.hexdigest()
+
+# Load the saved index for this PDF/parameter combination, or embed the chunks once and save them.
+# build_chunks is only called on a miss, so an unchanged document is never re-read or re-embedded.
+def load_or_build_index(pdf_path, embeddings, embedding_model, chunk_params, build_chunks, store_dir=None):
+    store_dir = store_dir or INDEX_STORE_DIR
+    key = index_key(pdf_path, chunk_params, embedding_model)
+    path = os.path.join(store_dir, key)
+
+    if os.path.exists(os.path.join(path, "meta.json")):
+        return FAISS.load_local(path, embeddings, allow_dangerous_deserialization=True)
+
+    chunks = build_chunks()
+    vectorstore = FAISS.from_texts(texts=chunks, embedding=embeddings)
+
+    # Write into a private directory and rename it into place so concurrent starts never see half an index
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    vectorstore.save_local(tmp_path)
+    with open(os.path.join(tmp_path, "meta.json"), 'w') as file:
+        json.dump({
+            "key": key,
+            "source": os.path.basename(pdf_path),
+            "chunking": chunk_params,
+            "embedding": embedding_model,
+            "chunks": len(chunks),
+            "created": time.time()
+        }, file)
+    try:
+        os.replace(tmp_path, path)
+    except OSError:
+        # Another process saved the same index first
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return vectorstore
@@ -0,0 +1,98 @@
+import os
+from datetime import timedelta
+import numpy as np
+from metrics import stage, predict_batch_rows
+
+# Rows per model.predict call when running a whole feature matrix
+PREDICT_CHUNK_SIZE = int(os.environ.get("PREDICT_CHUNK_SIZE", "4096"))
+
+# Days computed per step when streaming a date range
+STREAM_CHUNK_DAYS = int(os.environ.get("STREAM_CHUNK_DAYS", "1"))
+
+# Both models output 12 molecule values followed by the AQI
+N_OUTPUTS = 13
+
+# (chunk_from, chunk_to) day pairs covering from_date..to_date, chunk_days at a time
+def day_chunks(from_date, to_date, chunk_days=None):
+    chunk_days = chunk_days or STREAM_CHUNK_DAYS
+    current = from_date
+    while current <= to_date:
+        chunk_to = min(current + timedelta(days=chunk_days - 1), to_date)
+        yield current, chunk_to
+        current = chunk_to + timedelta(days=1)
+
+# Hourly timestamps covering every day from from_date to to_date (inclusive)
+def hourly_range(from_date, to_date, hours=range(24)):
+    days = (to_date.date() - from_date.date()).days + 1
+    if days <= 0:
+        return np.empty(0, dtype="datetime64[h]")
+    start = np.datetime64(from_date.date(), "D")
+    day_grid = start + np.arange(days, dtype="timedelta64[D]")
+    hour_grid = np.asarray(list(hours), dtype="timedelta64[h]")
+    return (day_grid.astype("datetime64[h]")[:, None] + hour_grid[None, :]).ravel()
+
+# year, month, day, hour, dayOfWeek, isWeekend columns for an array of hourly timestamps
+def time_features(times):
+    days = times.astype("datetime64[D]")
+    months = times.astype("datetime64[M]")
+    years = times.astype("datetime64[Y]")
+    features = np.empty((len(times), 6), dtype="float32")
+    features[:, 0] = years.astype(np.int64) + 1970
+    features[:, 1] = months.astype(np.int64) % 12 + 1
+    features[:, 2] = (days - months).astype(np.int64) + 1
+    features[:, 3] = (times - days).astype(np.int64)
+    # 1970-01-01 was a Thursday; shift so Monday == 0 like datetime.weekday()
+    day_of_week = (days.astype(np.int64) + 3) % 7
+    features[:, 4] = day_of_week
+    features[:, 5] = day_of_week >= 5
+    return features
+
+# Feature matrix for several locations over the same timestamps, location-major:
+# each row is a location's encoding followed by the time features
+def location_features(encodings, times):
+    with stage("features"):
+        encodings = np.asarray(encodings, dtype="float32").reshape(len(encodings), -1)
+        width = encodings.shape[1]
+        features = np.empty((len(encodings), len(times), width + 6), dtype="float32")
+        features[:, :, :width] = encodings[:, None, :]
+        features[:, :, width:] = time_features(times)
+        return features.reshape(-1, width + 6)
+
+# Run the model over a feature matrix in a few chunked predict calls
+def batch_predict(model, features, chunk_size=None):
+    chunk_size = chunk_size or PREDICT_CHUNK_SIZE
+    if len(features) == 0:
+        return np.empty((0, N_OUTPUTS), dtype="float32")
+    if len(features) <= chunk_size:
+        return _predict(model, features)
+    return np.concatenate([
+        _predict(model, features[start:start + chunk_size])
+        for start in range(0, len(features), chunk_size)
+    ])
+
+def _predict(model, features):
+    predict_batch_rows.observe(len(features))
+    with stage("predict"):
+        return np.asarray(model.predict(features))
+
+# Format timestamps the way the API always has: "%Y-%m-%d {hour}:00" (hour not zero padded)
+def format_hours(times):
+    days = times.astype("datetime64[D]")
+    hours = (times - days).astype(np.int64)
+    return [f"{day} {hour}:00" for day, hour in zip(days.astype(str).tolist(), hours.tolist())]
+
+# Turn a prediction matrix into the /predict-date-range response rows
+# (callers time this as part of their serialization stage)
+def prediction_rows(times, prediction):
+    values = prediction[:, :N_OUTPUTS].astype(np.int64).tolist()
+    return [
+        {"datetime": label, "aqi": row[12], "molecules": row[:12]}
+        for label, row in zip(format_hours(times), values)
+    ]
+
+# Lazily predict a date range one chunk of days at a time, yielding (times, prediction)
+# pairs. predict maps an array of hourly timestamps to a prediction matrix.
+def iter_predictions(predict, from_date, to_date, chunk_days=None):
+    for chunk_from, chunk_to in day_chunks(from_date, to_date, chunk_days):
+        times = hourly_range(chunk_from, chunk_to)
+        yield times, predict(times)
@@ -0,0 +1,52 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# Concurrent LLM calls, extra calls allowed to wait for a worker, and seconds a caller waits
+LLM_MAX_WORKERS = int(os.environ.get("LLM_MAX_WORKERS", "2"))
+LLM_MAX_QUEUE = int(os.environ.get("LLM_MAX_QUEUE", "16"))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", "120"))
+
+class LLMPoolFull(Exception):
+    pass
+
+class LLMTimeout(Exception):
+    pass
+
+# Runs blocking LLM calls on a bounded thread pool so they never stall the event loop.
+# At most max_workers calls run at once and at most max_queue more wait; beyond that
+# callers get LLMPoolFull straight away instead of piling up behind slow generations.
+class LLMPool:
+    def __init__(self, max_workers=None, max_queue=None, timeout=None):
+        self.max_workers = max_workers or LLM_MAX_WORKERS
+        self.max_queue = LLM_MAX_QUEUE if max_queue is None else max_queue
+        self.timeout = timeout or LLM_TIMEOUT
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    @property
+    def pending(self):
+        return self._pending
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    async def run(self, fn, *args, timeout=None):
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise LLMPoolFull("LLM queue is full")
+            self._pending += 1
+        # The slot is held until the worker thread really finishes (or the call is
+        # cancelled before it starts), not just until this caller stops waiting
+        future = self._executor.submit(fn, *args)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            raise LLMTimeout("LLM call timed out")
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
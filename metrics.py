@@ -0,0 +1,99 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Minimal in-process metrics with Prometheus text exposition, so the hot path only does a
+# bisect and a couple of additions per observation and /metrics renders on demand.
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1, 10, 24, 100, 1000, 10000, 100000, 1000000)
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, values)) + "}"
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [count per bucket..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[position] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values[:-1]):
+                cumulative += count
+                labels = _labels(self.labels + ("le",), label_values + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {values[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+# Values read from elsewhere (cache stats, queue depth) at scrape time.
+# collect() returns [(label values, value), ...].
+class Collected:
+    def __init__(self, name, help, kind, labels, collect):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.labels = tuple(labels)
+        self.collect = collect
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for label_values, value in self.collect():
+            lines.append(f"{self.name}{_labels(self.labels, tuple(label_values))} {value}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+registry = Registry()
+
+stage_seconds = registry.register(Histogram(
+    "aqi_stage_seconds", "Time spent in each request stage", labels=("stage",)
+))
+predict_batch_rows = registry.register(Histogram(
+    "aqi_predict_batch_rows", "Rows passed to a single model.predict call", buckets=SIZE_BUCKETS
+))
+request_seconds = registry.register(Histogram(
+    "aqi_request_seconds", "End-to-end request latency", labels=("path", "status")
+))
+
+# Time a block of work as one observation of aqi_stage_seconds{stage=name}
+@contextmanager
+def stage(name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        stage_seconds.observe(time.perf_counter() - started, name)
@@ -0,0 +1,81 @@
+import numpy as np
+
+# Hash lookups over the city list plus its one-hot rows, built once at startup
+class CityRegistry:
+    def __init__(self, cities):
+        self.names = list(cities)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.one_hot = np.eye(len(self.names), dtype="float32")
+        self.one_hot.setflags(write=False)
+        # Unknown cities encode as all zeros, like the original list-based encoder
+        self._unknown = np.zeros(len(self.names), dtype="float32")
+        self._unknown.setflags(write=False)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __len__(self):
+        return len(self.names)
+
+    def location(self, name):
+        return self.index.get(name)
+
+    # Read-only one-hot row for a city (shared, never copied)
+    def encode(self, name):
+        i = self.index.get(name)
+        return self._unknown if i is None else self.one_hot[i]
+
+    def encode_many(self, names):
+        return np.stack([self.encode(name) for name in names]) if names else np.empty((0, len(self)), dtype="float32")
+
+# Hash lookups over the station table by StationId, by StationName and by city. Several
+# names are shared by more than one station ("Pusa, Delhi", "Knowledge Park", "Sector");
+# those are listed in ambiguous_names and callers should ask for a StationId instead
+# (ids_for_name gives the candidates), since a name lookup only returns the first of them.
+class StationRegistry:
+    def __init__(self, stations):
+        self.stations = list(stations)
+        self.by_id = {}
+        self.by_name = {}
+        self.by_city = {}
+        self._ids_by_name = {}
+        for station in self.stations:
+            index = station["Unnamed: 0"]
+            self.by_id[station["StationId"]] = index
+            self.by_name.setdefault(station["StationName"], []).append(index)
+            self._ids_by_name.setdefault(station["StationName"], []).append(station["StationId"])
+            city = station_city(station["StationName"])
+            if city:
+                self.by_city.setdefault(city, []).append(station)
+        self.indexes = [station["Unnamed: 0"] for station in self.stations]
+        self.ambiguous_names = {name for name, indexes in self.by_name.items() if len(indexes) > 1}
+
+    def __len__(self):
+        return len(self.stations)
+
+    def index_for_id(self, station_id):
+        return self.by_id.get(station_id)
+
+    def index_for_name(self, station_name):
+        indexes = self.by_name.get(station_name)
+        return indexes[0] if indexes else None
+
+    def ids_for_name(self, station_name):
+        return self._ids_by_name.get(station_name, [])
+
+    # StationId wins when both are given
+    def resolve(self, station_id=None, station_name=None):
+        if station_id is not None:
+            return self.index_for_id(station_id)
+        if station_name is not None:
+            return self.index_for_name(station_name)
+        return None
+
+    def for_city(self, city):
+        return self.by_city.get(city, [])
+
+# City part of a "Place, City" station name; None for names without one
+def station_city(station_name):
+    if "," not in station_name:
+        return None
+    return station_name.rsplit(",", 1)[1].strip()
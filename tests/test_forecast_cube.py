@@ -0,0 +1,29 @@
+import os
+import sys
+from datetime import datetime
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from forecast_cube import ForecastCube, cached_predict
+from inference import N_OUTPUTS, hourly_range, location_features, batch_predict
+
+class LinearModel:
+    def __init__(self, n_features):
+        self.weights = np.random.default_rng(0).uniform(0.0, 1.0, size=(n_features, N_OUTPUTS))
+
+    def predict(self, X):
+        return np.asarray(X, dtype="float64") @ self.weights
+
+def test_cube_hit_keeps_requested_hour_order(tmp_path):
+    model = LinearModel(1 + 6)
+    encodings = [[index] for index in range(5)]
+    cube = ForecastCube("stations", "fingerprint", str(tmp_path))
+    cube.refresh(model, encodings, start=datetime(2026, 1, 1), days=3)
+
+    for hours in ([0, 2, 1, 3], [5, 5, 4], [23, 0]):
+        times = hourly_range(datetime(2026, 1, 2), datetime(2026, 1, 2), hours)
+        hits = cube.hits
+        cached = cached_predict(model, cube, [2], [encodings[2]], times)
+        assert cube.hits == hits + 1
+        expected = batch_predict(model, location_features([encodings[2]], times))
+        np.testing.assert_allclose(cached[0], expected[:, :N_OUTPUTS])